@@ -20,8 +20,9 @@ API Endpoints:
     GET  /list                          - List all graphs
     GET  /show?graph=name               - Show graph info
     GET  /search?q=query[&graph=name]   - Search graphs
+         Add &raw=true to get the CLI's EDN output unparsed
     POST /query                         - Execute datalog query
-         Body: {"graph": "name", "query": "..."}
+         Body: {"graph": "name", "query": "..."[, "raw": true]}
     POST /append                        - Append text to current page (requires API token)
          Body: {"content": "text"}
 
@@ -30,82 +31,1106 @@ Privacy:
     Debug mode logs all requests including search queries.
 """
 
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import http.client
 import http.server
 import json
 import subprocess
+import tempfile
 import urllib.parse
 import argparse
 import logging
+import logging.handlers
 import os
 import shutil
-import shlex
+import queue
+import re
+import threading
+import time
+from datetime import date
 from pathlib import Path
 
+try:
+    import orjson  # Optional: several times faster than the json module
+except ImportError:
+    orjson = None
+
 # Version
 VERSION = '0.1.0'  # Bumped for Quick Capture support
 
 # Configuration
 DEFAULT_PORT = 8765
 DEFAULT_HOST = 'localhost'
-LOG_FILE = Path(__file__).parent / 'logseq-http-server.log'
+LOG_FILE = Path(__file__).resolve().parent / 'logseq-http-server.log'
+# Working directory for the server and the CLI processes it starts. Node.js
+# fails with `EPERM: uv_cwd` if it can't access its working directory.
+SAFE_CWD = os.path.expanduser('~')
 LOGSEQ_BIN = os.environ.get('LOGSEQ_BIN', shutil.which('logseq') or '/opt/homebrew/bin/logseq')
 
 # API Token for Logseq HTTP API (used for append command)
 # Can be overridden with --api-token flag or LOGSEQ_API_SERVER_TOKEN env var
 LOGSEQ_API_TOKEN = os.environ.get('LOGSEQ_API_SERVER_TOKEN', '')
 
+# Set by --debug; also pretty-prints JSON responses for easier reading
+DEBUG = False
+
+# Logseq desktop HTTP API Server (Settings > Features > HTTP APIs Server)
+LOGSEQ_API_HOST = '127.0.0.1'
+LOGSEQ_API_PORT = 12315
+
+# Query batching: identical queries made while one is already running
+# share its Logseq call (see BatchQueue)
+BATCH_TIMEOUT = 35  # Must exceed the 30 second CLI timeout
+
+# Upper bound on concurrently running logseq CLI processes, each of which is
+# a Node.js process with a sizeable heap. Requests beyond this wait up to
+# CLI_SLOT_TIMEOUT seconds for a free slot, then get 503 so clients back off
+# instead of piling up behind a burst.
+MAX_CLI_PROCESSES = max(2, os.cpu_count() or 1)
+CLI_SLOT_TIMEOUT = 5
+
+# Seconds a successful command response is served from cache. Graph lists
+# rarely change; query results go stale quickly, so they are only reused
+# across bursts (e.g. repeated search keystrokes). Appends clear the cache.
+CACHE_TTLS = {
+    'list': 60,
+    'show': 10,
+    'query': 2,
+}
+CACHE_MAX_ENTRIES = 256
+
+# Datalog query behind /search (run as-is for raw=true), filled in with str.format.
+# Searches for PAGES (not blocks) by page name OR title. Searching both
+# name (lowercase) and title (mixed case) provides case-insensitive search
+# by matching either field. Returns page info: uuid, name, title, journal-day.
+# DB graphs use :block/title for content, not :block/content.
+SEARCH_DATALOG = '[:find (pull ?p [:db/id :block/uuid :block/name :block/title :block/journal-day]) :where [?p :block/name ?name] [?p :block/title ?title] (or [(clojure.string/includes? ?name "{q_lower}")] [(clojure.string/includes? ?title "{q_orig}")])]'
+
+# Every page /search can match, with the fields it returns. Fetched once per
+# graph and cached for PAGE_CACHE_TTL seconds; searches then filter it in
+# Python the same way SEARCH_DATALOG does, without running the CLI.
+PAGE_LIST_DATALOG = '[:find (pull ?p [:db/id :block/uuid :block/name :block/title :block/journal-day]) :where [?p :block/name ?name] [?p :block/title ?title]]'
+PAGE_CACHE_TTL = 30
+
+# Escapes backslashes and double quotes for a datalog string literal
+_DATALOG_ESCAPES = str.maketrans({'"': '\\"', '\\': '\\\\'})
+
+# Queries whose only :find element is a pull of explicitly listed attributes,
+# e.g. SEARCH_DATALOG. The Logseq API strips keyword namespaces from its
+# results (:block/title -> "title"), so these are the only queries whose
+# CLI-shaped keys can be rebuilt from the query itself.
+_PULL_QUERY = re.compile(r'\s*\[\s*:find\s+\(pull\s+\?[^\s()\[\]]+\s+\[([^\[\](){}"]*)\]\s*\)\s+:where\b')
+_PULL_ATTRIBUTE = re.compile(r':([\w.-]+)/([\w.!?-]+)')
+
+# Complete /health response, written with a single write(). Health checks
+# are the most frequent request and never vary.
+_HEALTH_BODY = json.dumps(
+    {'status': 'healthy', 'message': 'Logseq HTTP Server is running'},
+    separators=(',', ':')
+).encode('utf-8')
+_HEALTH_RESPONSE = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: application/json\r\n'
+    b'Access-Control-Allow-Origin: *\r\n'
+    b'Content-Length: ' + str(len(_HEALTH_BODY)).encode('ascii') + b'\r\n'
+    b'Connection: keep-alive\r\n'
+    b'\r\n' + _HEALTH_BODY
+)
+
+
+def _json_dumps(data, pretty=False):
+    """Serialize data to JSON bytes, compact unless pretty is set."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        try:
+            return orjson.dumps(data, option=option)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits; the json module handles those
+            pass
+    if pretty:
+        return json.dumps(data, indent=2).encode('utf-8')
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _json_loads(data):
+    """
+    Parse JSON from str or bytes.
+
+    Raises:
+        ValueError: If data is not valid JSON (json.JSONDecodeError, or
+                    UnicodeDecodeError for bytes that aren't UTF-8)
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 class PrivacyFilter(logging.Filter):
-    """Filter that blocks sensitive logging unless debug mode is enabled."""
+    """
+    Filter that blocks sensitive logging unless debug mode is enabled.
+
+    Decides on the record's level and category alone (see request_log,
+    health_log and system_log), so records it blocks are never formatted.
+    """
 
     def __init__(self, debug_mode=False):
         super().__init__()
         self.debug_mode = debug_mode
 
     def filter(self, record):
-        # Always allow startup, shutdown, errors
-        if record.levelno >= logging.ERROR:
+        # Errors, startup/shutdown and health checks are always logged;
+        # anything about user requests (or uncategorized) only in debug mode
+        return (self.debug_mode
+                or record.levelno >= logging.ERROR
+                or getattr(record, 'category', 'request') != 'request')
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for a queue read by a QueueListener in this process.
+
+    The stock prepare() formats each record in the logging thread so it can
+    be pickled; records here never leave the process, so they are enqueued
+    as-is and formatted by the listener's handlers instead.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+# Loggers tagging each record with the category PrivacyFilter checks
+_logger = logging.getLogger('logseq_server')
+request_log = logging.LoggerAdapter(_logger, {'category': 'request'})
+health_log = logging.LoggerAdapter(_logger, {'category': 'health'})
+system_log = logging.LoggerAdapter(_logger, {'category': 'system'})
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a per-entry TTL.
+
+    Entries are stored as (expires_at, value) tuples keyed in an OrderedDict,
+    with expiry measured on time.monotonic().
+    """
+
+    def __init__(self, maxsize=CACHE_MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl):
+        """Cache value under key for ttl seconds, evicting the oldest entries."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+class EDNDecodeError(ValueError):
+    """Raised when CLI output is not valid EDN."""
+
+
+# Atoms: anything up to whitespace, a delimiter, or the start of a string
+_EDN_TOKEN = re.compile(r'[^\s,;()\[\]{}"]+')
+_EDN_STRING_CHUNK = re.compile(r'[^"\\]*')
+_EDN_INT = re.compile(r'[+-]?\d+N?')
+_EDN_FLOAT = re.compile(r'[+-]?\d+(?:\.\d*)?(?:[eE][+-]?\d+)?M?')
+_EDN_STRING_ESCAPES = {'"': '"', '\\': '\\', 'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f'}
+_EDN_CHARACTERS = {'newline': '\n', 'space': ' ', 'tab': '\t', 'return': '\r', 'formfeed': '\f', 'backspace': '\b'}
+_EDN_CLOSERS = {'(': ')', '[': ']', '{': '}'}
+
+
+class _EDNReader:
+    """
+    Minimal reader for the EDN subset printed by `logseq query`.
+
+    Values are converted the same way `jet --to json` does: lists, vectors
+    and sets become lists, keywords and symbols become strings without the
+    leading colon (`:block/title` -> "block/title"), the keys of namespaced
+    maps are qualified (`#:block{:title "x"}` -> {"block/title": "x"}), nil
+    becomes None, and tagged literals such as `#uuid "..."` are replaced by
+    their value.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+
+    def read(self):
+        """Read a single top-level value, rejecting trailing content."""
+        value = self._read_value()
+        self._skip_whitespace()
+        if self.pos != len(self.text):
+            raise EDNDecodeError(f'Unexpected content at position {self.pos}')
+        return value
+
+    def _error(self, message):
+        return EDNDecodeError(f'{message} at position {self.pos}')
+
+    def _skip_whitespace(self):
+        """Skip whitespace, commas, comments and #_ discarded forms."""
+        text = self.text
+        while self.pos < len(text):
+            ch = text[self.pos]
+            if ch.isspace() or ch == ',':
+                self.pos += 1
+            elif ch == ';':
+                newline = text.find('\n', self.pos)
+                self.pos = len(text) if newline == -1 else newline + 1
+            elif text.startswith('#_', self.pos):
+                self.pos += 2
+                self._read_value()
+            else:
+                break
+
+    def _read_value(self):
+        self._skip_whitespace()
+        if self.pos >= len(self.text):
+            raise self._error('Unexpected end of input')
+
+        ch = self.text[self.pos]
+        if ch == '"':
+            return self._read_string()
+        if ch in '([':
+            self.pos += 1
+            return self._read_collection(_EDN_CLOSERS[ch])
+        if ch == '{':
+            self.pos += 1
+            items = self._read_collection('}')
+            if len(items) % 2:
+                raise self._error('Map literal with odd number of forms')
+            return {self._map_key(k): v for k, v in zip(items[::2], items[1::2])}
+        if ch == '#':
+            if self.text.startswith('#{', self.pos):
+                self.pos += 2
+                return self._read_collection('}')
+            if self.text.startswith('#:', self.pos):
+                return self._read_namespaced_map()
+            # Tagged literal (#uuid, #inst, ...): keep the tagged value
+            self.pos += 1
+            self._read_token()
+            return self._read_value()
+        if ch == '\\':
+            return self._read_character()
+        if ch in ')]}':
+            raise self._error(f'Unexpected {ch!r}')
+
+        return self._parse_atom(self._read_token())
+
+    def _read_collection(self, closer):
+        items = []
+        while True:
+            self._skip_whitespace()
+            if self.pos >= len(self.text):
+                raise self._error(f'Missing {closer!r}')
+            if self.text[self.pos] == closer:
+                self.pos += 1
+                return items
+            items.append(self._read_value())
+
+    def _read_namespaced_map(self):
+        """
+        Read a #:ns{...} map, qualifying its keys as Clojure does: `:name` and
+        `name` become "ns/name", `:_/name` becomes "name", and keys that
+        already have a namespace (or aren't keywords or symbols) are kept.
+        """
+        self.pos += 2
+        namespace = self._read_token()
+        if namespace.startswith(':'):
+            # #::{...} qualifies keys with the reader's current namespace
+            raise self._error('Auto-resolved namespaced maps are not supported')
+        self._skip_whitespace()
+        if self.text[self.pos:self.pos + 1] != '{':
+            raise self._error('Namespaced map must be followed by a map')
+        self.pos += 1
+
+        entries = {}
+        while True:
+            self._skip_whitespace()
+            if self.pos >= len(self.text):
+                raise self._error("Missing '}'")
+            if self.text[self.pos] == '}':
+                self.pos += 1
+                return entries
+
+            token = None if self.text[self.pos] in '#\\' else _EDN_TOKEN.match(self.text, self.pos)
+            if token:
+                self.pos = token.end()
+                key = self._parse_atom(token.group())
+                if isinstance(key, str):
+                    if key.startswith('_/'):
+                        key = key[2:]
+                    elif '/' not in key:
+                        key = f'{namespace}/{key}'
+            else:
+                key = self._read_value()
+
+            self._skip_whitespace()
+            if self.text[self.pos:self.pos + 1] == '}':
+                raise self._error('Map literal with odd number of forms')
+            entries[self._map_key(key)] = self._read_value()
+
+    def _read_string(self):
+        text = self.text
+        self.pos += 1
+        parts = []
+        while True:
+            chunk = _EDN_STRING_CHUNK.match(text, self.pos)
+            parts.append(chunk.group())
+            self.pos = chunk.end()
+            if self.pos >= len(text):
+                raise self._error('Unterminated string')
+            if text[self.pos] == '"':
+                self.pos += 1
+                return ''.join(parts)
+
+            escape = text[self.pos + 1:self.pos + 2]
+            if escape == 'u':
+                parts.append(chr(int(text[self.pos + 2:self.pos + 6], 16)))
+                self.pos += 6
+            elif escape in _EDN_STRING_ESCAPES:
+                parts.append(_EDN_STRING_ESCAPES[escape])
+                self.pos += 2
+            else:
+                raise self._error(f'Invalid string escape {escape!r}')
+
+    def _read_character(self):
+        # A backslash is followed by at least one character, even a delimiter
+        start = self.pos + 1
+        if start >= len(self.text):
+            raise self._error('Unexpected end of input')
+        self.pos = start + 1
+        token = _EDN_TOKEN.match(self.text, self.pos)
+        if token:
+            self.pos = token.end()
+        name = self.text[start:self.pos]
+
+        if len(name) == 1:
+            return name
+        if name in _EDN_CHARACTERS:
+            return _EDN_CHARACTERS[name]
+        if name.startswith('u') and len(name) == 5:
+            return chr(int(name[1:], 16))
+        raise self._error(f'Invalid character literal \\{name}')
+
+    def _read_token(self):
+        token = _EDN_TOKEN.match(self.text, self.pos)
+        if not token:
+            raise self._error('Expected a value')
+        self.pos = token.end()
+        return token.group()
+
+    @staticmethod
+    def _parse_atom(token):
+        if token == 'nil':
+            return None
+        if token == 'true':
             return True
+        if token == 'false':
+            return False
+        if token.startswith(':'):
+            return token[1:]
+        if _EDN_INT.fullmatch(token):
+            return int(token.rstrip('N'))
+        if _EDN_FLOAT.fullmatch(token):
+            return float(token.rstrip('M'))
+        # Symbols
+        return token
+
+    @staticmethod
+    def _map_key(key):
+        # JSON object keys must be strings; keep composite keys readable
+        if isinstance(key, (list, dict)):
+            return json.dumps(key)
+        return key
+
+
+def edn_loads(text):
+    """
+    Parse EDN text into JSON-compatible Python values.
+
+    Raises:
+        EDNDecodeError: If text is not valid EDN
+    """
+    try:
+        return _EDNReader(text).read()
+    except EDNDecodeError:
+        raise
+    except (ValueError, RecursionError) as e:
+        # Malformed \u escapes, absurdly deep nesting
+        raise EDNDecodeError(str(e)) from e
+
+
+_EDN_UUID_KEYS = frozenset({'block/uuid'})
+
+
+def edn_dumps(data):
+    """
+    Render values from edn_loads() as EDN text, the inverse conversion.
+
+    String keys are written as keywords and values under _EDN_UUID_KEYS
+    as #uuid literals, as printed by `logseq query`.
+    """
+    if isinstance(data, list):
+        return '[' + ' '.join(edn_dumps(item) for item in data) + ']'
+    if isinstance(data, dict):
+        return '{' + ', '.join(
+            f':{key} #uuid {json.dumps(value)}' if key in _EDN_UUID_KEYS and isinstance(value, str)
+            else f':{key} {edn_dumps(value)}'
+            for key, value in data.items()
+        ) + '}'
+    if data is None:
+        return 'nil'
+    if isinstance(data, bool):
+        return 'true' if data else 'false'
+    if isinstance(data, str):
+        return json.dumps(data, ensure_ascii=False)
+    return repr(data)
+
+
+class ServerOverloadedError(Exception):
+    """Raised when no CLI process slot frees up within CLI_SLOT_TIMEOUT."""
+
+
+class LogseqAPIError(Exception):
+    """Raised when the Logseq HTTP API answers with a non-200 status."""
+
+    def __init__(self, status, body):
+        super().__init__(f'{status} - {body}')
+        self.status = status
+        self.body = body
+
+
+class LogseqClient:
+    """
+    Client for the Logseq desktop HTTP API.
+
+    Keeps a single keep-alive connection to the API server so that repeated
+    calls cost a loopback round-trip instead of a new TCP connection (or a
+    fresh logseq CLI process). The connection is shared by all handler
+    threads and guarded by a lock.
+    """
+
+    def __init__(self, host=LOGSEQ_API_HOST, port=LOGSEQ_API_PORT, timeout=10):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def call(self, method, args, api_token):
+        """
+        Invoke a Logseq API method.
 
-        # If debug mode, allow everything
-        if self.debug_mode:
-            return True
+        Args:
+            method: API method name, e.g. 'logseq.DB.datascriptQuery'
+            args: List of positional arguments for the method
+            api_token: Logseq HTTP API Server token
 
-        # In privacy mode, only allow health checks and system messages
-        message = record.getMessage()
-        if 'GET /health' in message or 'Server' in message:
-            return True
+        Returns:
+            Decoded JSON result, or None if Logseq returned null
+
+        Raises:
+            LogseqAPIError: If the API answers with a non-200 status
+            OSError: If Logseq cannot be reached
+        """
+        payload = _json_dumps({'method': method, 'args': args})
+        headers = self._headers(api_token)
+
+        with self._lock:
+            while True:
+                reused = self._conn is not None
+                if not reused:
+                    self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                try:
+                    self._conn.request('POST', '/api', body=payload, headers=headers)
+                    response = self._conn.getresponse()
+                    body = response.read()
+                    break
+                except (http.client.HTTPException, ConnectionError):
+                    self._conn.close()
+                    self._conn = None
+                    # A reused keep-alive connection may have been closed by
+                    # Logseq while idle; retry once on a fresh connection.
+                    if not reused:
+                        raise
+                except OSError:
+                    self._conn.close()
+                    self._conn = None
+                    raise
+
+        if response.status != 200:
+            raise LogseqAPIError(response.status, body.decode('utf-8', errors='replace'))
+
+        if body and body != b'null':
+            return _json_loads(body)
+        return None
+
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _headers(api_token):
+        """Request headers for a token, built once per token (not mutated)."""
+        return {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {api_token}'.encode('latin-1')
+        }
+
+    def current_graph(self, api_token):
+        """Return info about the graph currently open in Logseq, or None."""
+        return self.call('logseq.App.getCurrentGraph', [], api_token)
+
+    def datascript_query(self, query, api_token):
+        """Run a datalog query against the graph currently open in Logseq."""
+        return self.call('logseq.DB.datascriptQuery', [query], api_token)
+
+
+# Shared by all request handlers
+LOGSEQ_CLIENT = LogseqClient()
 
-        # Block all other requests
-        return False
+# (date, journal page name) for the last day _today_journal_page() saw
+_journal_page = (None, None)
+
+
+def _today_journal_page():
+    """Return today's journal page name (YYYY-MM-DD), formatted once per day."""
+    global _journal_page
+    today = date.today()
+    day, name = _journal_page
+    if day != today:
+        name = today.strftime('%Y-%m-%d')
+        _journal_page = (today, name)
+    return name
+
+
+_CLI_SEMAPHORE = threading.BoundedSemaphore(MAX_CLI_PROCESSES)
+
+# Successful command responses, keyed by (command, args)
+COMMAND_CACHE = TTLCache()
+
+# Page lists (PAGE_LIST_DATALOG results), keyed by graph
+PAGE_CACHE = TTLCache()
+
+
+def _invalidate_caches():
+    """Forget cached graph data after a write."""
+    COMMAND_CACHE.clear()
+    PAGE_CACHE.clear()
+
+
+def _run_cli(cmd, timeout, stdout=subprocess.PIPE, slot_deadline=None):
+    """
+    Run a CLI command via subprocess.run once a process slot is free.
+
+    The child inherits the server's environment and working directory
+    (main() changes to the home directory at startup, see SAFE_CWD). With
+    no cwd, env or preexec_fn to apply and close_fds=False, CPython starts
+    the process with posix_spawn instead of fork+exec, so the server's page
+    tables aren't copied for every command. Keeping fds open is safe: the
+    server's sockets and files are non-inheritable (PEP 446), only the
+    stdio pipes reach the child.
+
+    Output is captured as bytes and decoded once as UTF-8 (what Node.js
+    writes) after the process slot is released, instead of going through
+    text-mode pipes that decode with the locale's encoding and translate
+    newlines chunk by chunk.
+
+    Args:
+        cmd: Command and arguments
+        timeout: Seconds before the process is killed
+        stdout: Where to send stdout; by default it is captured
+        slot_deadline: time.monotonic() value by which a process slot must
+                       be free; defaults to CLI_SLOT_TIMEOUT seconds from now
+
+    Returns:
+        subprocess.CompletedProcess: With stderr, and stdout if captured, as str
+
+    Raises:
+        ServerOverloadedError: If no process slot is free by slot_deadline
+    """
+    slot_timeout = CLI_SLOT_TIMEOUT if slot_deadline is None else max(0, slot_deadline - time.monotonic())
+    if not _CLI_SEMAPHORE.acquire(timeout=slot_timeout):
+        raise ServerOverloadedError(f'All {MAX_CLI_PROCESSES} logseq CLI slots are busy')
+    try:
+        result = subprocess.run(cmd, stdout=stdout, stderr=subprocess.PIPE, timeout=timeout, close_fds=False)
+    finally:
+        _CLI_SEMAPHORE.release()
+    if result.stdout is not None:
+        result.stdout = result.stdout.decode('utf-8', errors='replace')
+    result.stderr = result.stderr.decode('utf-8', errors='replace')
+    return result
+
+
+def _api_key_map(query):
+    """
+    Map Logseq API result keys back to the attributes a query pulls.
+
+    Returns:
+        dict: API key -> namespaced key (e.g. "journalDay" and "journal-day"
+              -> "block/journal-day"), or None if the query is not a single
+              pull of explicit attributes, or two attributes share a name
+    """
+    match = _PULL_QUERY.match(query)
+    if not match:
+        return None
+    attributes = match.group(1).split()
+    if not attributes:
+        return None
+
+    key_map = {}
+    for attribute in attributes:
+        parsed = _PULL_ATTRIBUTE.fullmatch(attribute)
+        if not parsed:
+            return None
+        namespace, name = parsed.groups()
+        head, *rest = name.split('-')
+        for api_key in {name, head + ''.join(word.capitalize() for word in rest)}:
+            if api_key in key_map:
+                return None
+            key_map[api_key] = f'{namespace}/{name}'
+    return key_map
+
+
+# API key -> CLI key for the fields of a PAGE_LIST_DATALOG page
+_PAGE_KEYS = _api_key_map(PAGE_LIST_DATALOG)
+
+
+def _page_record(page):
+    """
+    Return a PAGE_LIST_DATALOG page with the CLI's namespaced keys
+    (block/name, ...), whichever backend returned it.
+    """
+    return {_PAGE_KEYS.get(key, key): value for key, value in page.items()}
+
+
+def _query_via_api(query, graph):
+    """
+    Run a datalog query through the Logseq HTTP API.
+
+    Only used when an API token is configured, the requested graph is the
+    one currently open in Logseq, and the query is a single pull of explicit
+    attributes (see _PULL_QUERY), so the API's namespace-stripped keys can be
+    mapped back to the ones the CLI returns.
+
+    Returns:
+        dict: Response in the same shape as _run_logseq_command, or
+              None if the query should fall back to the CLI
+    """
+    key_map = _api_key_map(query)
+    if key_map is None:
+        return None
+
+    try:
+        current = LOGSEQ_CLIENT.current_graph(LOGSEQ_API_TOKEN) or {}
+        if graph not in (current.get('name'), current.get('url')):
+            return None
+        rows = LOGSEQ_CLIENT.datascript_query(query, LOGSEQ_API_TOKEN)
+    except (OSError, http.client.HTTPException, LogseqAPIError, ValueError) as e:
+        request_log.info(f"Logseq API unavailable, falling back to CLI: {e}")
+        return None
+
+    # The API returns one 1-tuple per pulled entity; the CLI prints a flat
+    # list of entities. Anything else (nested refs, unknown keys) can't be
+    # shown to match the CLI output, so let the CLI answer instead.
+    data = []
+    for row in rows or ():
+        entity = row[0] if isinstance(row, list) and len(row) == 1 else None
+        if not isinstance(entity, dict) or any(
+                key not in key_map or isinstance(value, (dict, list)) for key, value in entity.items()):
+            request_log.info("Unexpected Logseq API result shape, falling back to CLI")
+            return None
+        data.append({key_map[key]: value for key, value in entity.items()})
+
+    return {
+        'success': True,
+        'stdout': edn_dumps(data),
+        'stderr': '',
+        'returncode': 0,
+        'data': data
+    }
+
+
+def _command_cache_key(command, args=None):
+    """Return the COMMAND_CACHE key for a command invocation."""
+    return (command, tuple(args or ()))
+
+
+def _execute_logseq_command(command, args=None, slot_deadline=None):
+    """
+    Execute a logseq command, serving repeat calls from COMMAND_CACHE.
+
+    Commands listed in CACHE_TTLS are cached for their TTL when they
+    succeed; see _run_logseq_command for arguments and return value.
+    """
+    ttl = CACHE_TTLS.get(command)
+    if ttl is None:
+        return _run_logseq_command(command, args, slot_deadline)
+
+    key = _command_cache_key(command, args)
+    response = COMMAND_CACHE.get(key)
+    if response is None:
+        response = _run_logseq_command(command, args, slot_deadline)
+        if response.get('success'):
+            COMMAND_CACHE.put(key, response, ttl)
+    return response
+
+
+def _run_logseq_command(command, args=None, slot_deadline=None):
+    """
+    Execute a logseq CLI command.
+
+    Queries are sent to the running Logseq desktop app over its HTTP API
+    when possible, which avoids starting a CLI process per request.
+    Everything else, and queries for graphs that are not open in the app,
+    go through the CLI.
+
+    Args:
+        command: Command name (list, show, search, query, etc.)
+        args: List of additional arguments
+              NOTE: As of @logseq/cli v4.0, the 'query' command requires -g flag:
+              `logseq query "datalog" -g graph-name`
+              The 'show' command still uses positional arguments:
+              `logseq show graph-name`
+        slot_deadline: Passed to _run_cli
+
+    Returns:
+        dict: Response with success, stdout, stderr, and optional data
+    """
+    if args is None:
+        args = []
+
+    if command == 'query' and LOGSEQ_API_TOKEN and '-g' in args:
+        response = _query_via_api(args[0], args[args.index('-g') + 1])
+        if response is not None:
+            return response
+
+    cmd = [LOGSEQ_BIN, command] + args
+
+    request_log.info(f"Executing: {' '.join(cmd)}")
+
+    try:
+        result = _run_cli(cmd, timeout=30, slot_deadline=slot_deadline)
+
+        stdout = result.stdout
+        stderr = result.stderr
+        returncode = result.returncode
+
+        response = {
+            'success': returncode == 0,
+            'stdout': stdout,
+            'stderr': stderr,
+            'returncode': returncode
+        }
+
+        stdout_stripped = stdout.strip()
+        if command == 'query' and stdout_stripped:
+            # Query results are printed as EDN
+            try:
+                response['data'] = edn_loads(stdout_stripped)
+            except EDNDecodeError:
+                pass
+        elif stdout_stripped and (stdout_stripped.startswith('{') or stdout_stripped.startswith('[')):
+            # Try to parse stdout as JSON if it looks like JSON
+            try:
+                response['data'] = _json_loads(stdout_stripped)
+            except ValueError:
+                pass
+
+        return response
+
+    except subprocess.TimeoutExpired:
+        request_log.error("Command timed out")
+        return {
+            'success': False,
+            'error': 'Command execution timed out after 30 seconds'
+        }
+    except FileNotFoundError:
+        request_log.error("logseq command not found")
+        return {
+            'success': False,
+            'error': 'logseq CLI not found. Install with: npm install -g @logseq/cli'
+        }
+    except ServerOverloadedError:
+        # Handled by the request dispatcher (503)
+        raise
+    except Exception as e:
+        request_log.error(f"Error executing command: {e}", exc_info=True)
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+
+def _search_datalog(query):
+    """Build the /search datalog query for a search term."""
+    escaped = query.translate(_DATALOG_ESCAPES)
+    return SEARCH_DATALOG.format(q_lower=escaped.lower(), q_orig=escaped)
+
+
+class BatchQueue:
+    """
+    Coalesces identical queries while one of them is in flight.
+
+    Handler threads submit (graph, query) pairs and wait on a Future. The
+    first submission of a pair starts the Logseq call on a worker pool;
+    identical submissions made before it completes join it instead of
+    starting another, and every caller gets the same response. Nothing is
+    held back waiting for company, so a lone query starts immediately.
+
+    The CLI_SLOT_TIMEOUT wait for a process slot counts from the first
+    submission, so time spent queued for a worker is part of it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (graph, query) -> futures of the callers waiting on its call
+        self._in_flight = {}
+        # Calls run on a pool so a slow CLI call never holds up other queries
+        self._executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix='logseq-batch')
+
+    def submit(self, graph, query):
+        """
+        Queue a datalog query for execution.
+
+        Args:
+            graph: Graph name
+            query: Datalog query
+
+        Returns:
+            concurrent.futures.Future: Resolves to the command response dict
+        """
+        future = concurrent.futures.Future()
+
+        cached = COMMAND_CACHE.get(_command_cache_key('query', [query, '-g', graph]))
+        if cached is not None:
+            future.set_result(cached)
+            return future
+
+        key = (graph, query)
+        with self._lock:
+            waiting = self._in_flight.get(key)
+            if waiting is not None:
+                waiting.append(future)
+                return future
+            self._in_flight[key] = [future]
+
+        self._executor.submit(self._flush, graph, query, time.monotonic())
+        return future
+
+    def _flush(self, graph, query, submitted_at):
+        """Execute one distinct query and resolve every future waiting on it."""
+        key = (graph, query)
+        with self._lock:
+            # Skip the call if every caller gave up while it was queued
+            if all(future.cancelled() for future in self._in_flight[key]):
+                del self._in_flight[key]
+                return
+
+        try:
+            response = _execute_logseq_command('query', [query, '-g', graph],
+                                               slot_deadline=submitted_at + CLI_SLOT_TIMEOUT)
+        except Exception as e:
+            if not isinstance(e, ServerOverloadedError):
+                request_log.error(f"Error executing batch: {e}", exc_info=True)
+            self._resolve(key, lambda future: future.set_exception(e))
+            return
+
+        self._resolve(key, lambda future: future.set_result(response))
+
+    def _resolve(self, key, resolve):
+        """End the call for key and resolve its callers that are still waiting."""
+        # A successful response is already in COMMAND_CACHE, so callers
+        # arriving after this are served from there
+        with self._lock:
+            futures = self._in_flight.pop(key)
+        for future in futures:
+            if future.set_running_or_notify_cancel():
+                resolve(future)
+
+
+# Shared by all request handlers
+BATCH_QUEUE = BatchQueue()
 
 
 class LogseqHTTPHandler(http.server.BaseHTTPRequestHandler):
     """HTTP request handler for Logseq CLI commands."""
 
-    def _set_headers(self, status=200, content_type='application/json'):
+    # Keep connections open between requests so clients like the Raycast
+    # extension don't pay a TCP handshake per keystroke-driven search.
+    # Every response with a body must therefore send Content-Length.
+    protocol_version = 'HTTP/1.1'
+    # Buffer response writes; headers and body go out in one flush
+    wbufsize = -1
+    # Close idle keep-alive connections after this many seconds
+    timeout = 60
+
+    def _set_headers(self, status=200, content_type='application/json', etag=None, content_length=None):
         """Set response headers including CORS."""
         self.send_response(status)
-        self.send_header('Content-Type', content_type)
+        if status != 304:
+            self.send_header('Content-Type', content_type)
+        if content_length is not None:
+            self.send_header('Content-Length', str(content_length))
+        if not self.close_connection:
+            self.send_header('Connection', 'keep-alive')
+
+        if etag:
+            # Let clients revalidate with If-None-Match instead of re-fetching
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
 
         # CORS headers - allow all origins for development
         # For production, restrict to specific extension origins
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
 
         self.end_headers()
 
+    def _etag_matches(self, etag):
+        """Check whether the request's If-None-Match header covers etag."""
+        if_none_match = self.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
     def _send_json(self, data, status=200):
-        """Send JSON response."""
-        self._set_headers(status)
-        response = json.dumps(data, indent=2).encode('utf-8')
+        """Send JSON response, or 304 if a GET client already has it."""
+        response = _json_dumps(data, pretty=DEBUG)
+
+        etag = None
+        if self.command == 'GET' and status == 200:
+            etag = f'"{hashlib.blake2b(response, digest_size=16).hexdigest()}"'
+            if self._etag_matches(etag):
+                self._set_headers(304, etag=etag)
+                return
+
+        self._set_headers(status, etag=etag, content_length=len(response))
         self.wfile.write(response)
 
     def _send_error_json(self, message, status=400):
         """Send error response."""
         self._send_json({'success': False, 'error': message}, status)
 
+    def _wait_for_batch(self, future):
+        """Wait for a batched query submitted to BATCH_QUEUE."""
+        try:
+            return future.result(timeout=BATCH_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            # Don't start the CLI for it if it hasn't been picked up yet
+            future.cancel()
+            request_log.error("Batched query timed out")
+            return {
+                'success': False,
+                'error': f'Query did not complete within {BATCH_TIMEOUT} seconds'
+            }
+        except ServerOverloadedError:
+            raise
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def _graph_pages(self, graph):
+        """
+        Return the response for PAGE_LIST_DATALOG on a graph, from PAGE_CACHE
+        if it was fetched within the last PAGE_CACHE_TTL seconds.
+        """
+        response = PAGE_CACHE.get(graph)
+        if response is None:
+            # CLI v4.0 format: logseq query "datalog" -g graph-name
+            response = self._wait_for_batch(BATCH_QUEUE.submit(graph, PAGE_LIST_DATALOG))
+            if response.get('success') and isinstance(response.get('data'), list):
+                # Normalize once here rather than on every keystroke
+                pages = [_page_record(page) for page in response['data'] if isinstance(page, dict)]
+                response = {**response, 'data': pages}
+                PAGE_CACHE.put(graph, response, PAGE_CACHE_TTL)
+        return response
+
+    def _send_raw_query(self, query, graph):
+        """
+        Send the CLI's EDN output for a query to the client as-is.
+
+        The output is written to a temporary file and sent with sendfile,
+        so it is never copied into Python, parsed or re-serialized. Always
+        runs the CLI, bypassing the Logseq API, the cache and batching.
+        Failures are reported as regular JSON error responses.
+        """
+        cmd = [LOGSEQ_BIN, 'query', query, '-g', graph]
+
+        request_log.info(f"Executing (raw): {' '.join(cmd)}")
+
+        with contextlib.ExitStack() as stack:
+            try:
+                output = stack.enter_context(tempfile.TemporaryFile())
+                result = _run_cli(cmd, timeout=30, stdout=output)
+            except subprocess.TimeoutExpired:
+                request_log.error("Command timed out")
+                self._send_json({
+                    'success': False,
+                    'error': 'Command execution timed out after 30 seconds'
+                })
+                return
+            except FileNotFoundError:
+                request_log.error("logseq command not found")
+                self._send_json({
+                    'success': False,
+                    'error': 'logseq CLI not found. Install with: npm install -g @logseq/cli'
+                })
+                return
+            except ServerOverloadedError:
+                # Handled by the request dispatcher (503)
+                raise
+            except Exception as e:
+                request_log.error(f"Error executing command: {e}", exc_info=True)
+                self._send_json({
+                    'success': False,
+                    'error': str(e)
+                })
+                return
+
+            if result.returncode != 0:
+                self._send_json({
+                    'success': False,
+                    'stdout': '',
+                    'stderr': result.stderr,
+                    'returncode': result.returncode
+                })
+                return
+
+            size = os.fstat(output.fileno()).st_size
+            self._set_headers(200, content_type='application/edn; charset=utf-8', content_length=size)
+            # Headers are buffered in wfile; they must reach the socket first
+            self.wfile.flush()
+            self.connection.sendfile(output, 0, size)
+
     def _append_to_journal(self, content, api_token):
         """
         Append content to today's journal using Logseq's native HTTP API.
@@ -120,45 +1145,28 @@ class LogseqHTTPHandler(http.server.BaseHTTPRequestHandler):
         Returns:
             dict: Response with success status and any error message
         """
-        import urllib.request
-        from datetime import datetime
-
         # Get today's date in Logseq journal format (YYYY-MM-DD)
-        today = datetime.now().strftime('%Y-%m-%d')
-
-        # Build the API request
-        api_url = 'http://127.0.0.1:12315/api'
-        payload = json.dumps({
-            'method': 'logseq.Editor.appendBlockInPage',
-            'args': [today, content]
-        }).encode('utf-8')
+        today = _today_journal_page()
 
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {api_token}'
-        }
-
-        logging.info(f"Appending to journal: {today}")
+        request_log.info(f"Appending to journal: {today}")
 
         try:
-            req = urllib.request.Request(api_url, data=payload, headers=headers, method='POST')
-            with urllib.request.urlopen(req, timeout=10) as response:
-                result = response.read().decode('utf-8')
-                if result and result != 'null':
-                    return {'success': True, 'data': json.loads(result)}
-                else:
-                    # null response might mean page doesn't exist, try creating it first
-                    return {'success': True}
-
-        except urllib.error.HTTPError as e:
-            error_body = e.read().decode('utf-8') if e.fp else str(e)
-            logging.error(f"Logseq API error: {e.code} - {error_body}")
-            return {'success': False, 'error': f'Logseq API error: {e.code} - {error_body}'}
-        except urllib.error.URLError as e:
-            logging.error(f"Cannot connect to Logseq: {e}")
+            # Sent over LOGSEQ_CLIENT's persistent connection
+            result = LOGSEQ_CLIENT.call('logseq.Editor.appendBlockInPage', [today, content], api_token)
+            if result is not None:
+                return {'success': True, 'data': result}
+            else:
+                # null response might mean page doesn't exist, try creating it first
+                return {'success': True}
+
+        except LogseqAPIError as e:
+            request_log.error(f"Logseq API error: {e.status} - {e.body}")
+            return {'success': False, 'error': f'Logseq API error: {e.status} - {e.body}'}
+        except (OSError, http.client.HTTPException) as e:
+            request_log.error(f"Cannot connect to Logseq: {e}")
             return {'success': False, 'error': 'Cannot connect to Logseq. Make sure Logseq is running with HTTP API Server enabled.'}
         except Exception as e:
-            logging.error(f"Unexpected error: {e}")
+            request_log.error(f"Unexpected error: {e}")
             return {'success': False, 'error': str(e)}
 
     def _execute_append_command(self, content, api_token):
@@ -177,292 +1185,261 @@ class LogseqHTTPHandler(http.server.BaseHTTPRequestHandler):
         """
         cmd = [LOGSEQ_BIN, 'append', content, '-a', api_token]
 
-        logging.info("Executing: logseq append <content> -a <token>")  # Don't log sensitive data
+        request_log.info("Executing: logseq append <content> -a <token>")  # Don't log sensitive data
 
         try:
-            env = os.environ.copy()
-            safe_cwd = os.path.expanduser('~')
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30,
-                env=env,
-                cwd=safe_cwd
-            )
+            result = _run_cli(cmd, timeout=30)
 
             if result.returncode == 0:
                 return {'success': True}
             else:
                 error_msg = result.stderr.strip() or result.stdout.strip() or 'Unknown error'
-                logging.error(f"Append command failed: {error_msg}")
+                request_log.error(f"Append command failed: {error_msg}")
                 return {'success': False, 'error': error_msg}
 
         except subprocess.TimeoutExpired:
-            logging.error("Append command timed out")
+            request_log.error("Append command timed out")
             return {'success': False, 'error': 'Command execution timed out after 30 seconds'}
         except FileNotFoundError:
-            logging.error("logseq command not found")
+            request_log.error("logseq command not found")
             return {
                 'success': False,
                 'error': 'logseq CLI not found. Install with: npm install -g @logseq/cli'
             }
+        except ServerOverloadedError:
+            raise
         except Exception as e:
-            logging.error(f"Error executing append command: {e}", exc_info=True)
+            request_log.error(f"Error executing append command: {e}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
-    def _execute_logseq_command(self, command, args=None):
-        """
-        Execute a logseq CLI command.
+    def do_OPTIONS(self):
+        """Handle OPTIONS requests for CORS preflight."""
+        self._set_headers(204)
 
-        Args:
-            command: Command name (list, show, search, query, etc.)
-            args: List of additional arguments
-                  NOTE: As of @logseq/cli v4.0, the 'query' command requires -g flag:
-                  `logseq query "datalog" -g graph-name`
-                  The 'show' command still uses positional arguments:
-                  `logseq show graph-name`
+    # GET route handlers, called with the query parameters as a {name: value} dict
 
-        Returns:
-            dict: Response with success, stdout, stderr, and optional data
-        """
-        if args is None:
-            args = []
+    def _handle_health(self, params):
+        self._send_json({'status': 'healthy', 'message': 'Logseq HTTP Server is running'})
 
-        cmd = [LOGSEQ_BIN, command] + args
+    def _handle_version(self, params):
+        self._send_json({'version': VERSION})
 
-        logging.info(f"Executing: {' '.join(cmd)}")
+    def _handle_list(self, params):
+        response = _execute_logseq_command('list')
+        self._send_json(response)
 
-        try:
-            env = os.environ.copy()
-            safe_cwd = os.path.expanduser('~')
-
-            # For query commands, pipe through jet to convert EDN to JSON
-            if command == 'query':
-                # Use shell pipe with proper quoting
-                quoted_cmd = ' '.join(shlex.quote(arg) for arg in cmd)
-                shell_cmd = f"{quoted_cmd} | jet --to json"
-                result = subprocess.run(
-                    shell_cmd,
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=30,
-                    env=env,
-                    cwd=safe_cwd
-                )
-            else:
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=30,
-                    env=env,
-                    cwd=safe_cwd
-                )
-
-            stdout = result.stdout
-            stderr = result.stderr
-            returncode = result.returncode
-
-            response = {
-                'success': returncode == 0,
-                'stdout': stdout,
-                'stderr': stderr,
-                'returncode': returncode
-            }
+    def _handle_show(self, params):
+        graph = params.get('graph')
+        if not graph:
+            self._send_error_json('Missing required parameter: graph')
+            return
 
-            # Try to parse stdout as JSON if it looks like JSON
-            stdout_stripped = stdout.strip()
-            if stdout_stripped and (stdout_stripped.startswith('{') or stdout_stripped.startswith('[')):
-                try:
-                    response['data'] = json.loads(stdout_stripped)
-                except json.JSONDecodeError:
-                    pass
+        response = _execute_logseq_command('show', [graph])
+        self._send_json(response)
 
-            return response
+    def _handle_search(self, params):
+        query = params.get('q')
+        if not query:
+            self._send_error_json('Missing required parameter: q')
+            return
 
-        except subprocess.TimeoutExpired:
-            logging.error("Command timed out")
-            return {
-                'success': False,
-                'error': 'Command execution timed out after 30 seconds'
-            }
-        except FileNotFoundError:
-            logging.error("logseq command not found")
-            return {
-                'success': False,
-                'error': 'logseq CLI not found. Install with: npm install -g @logseq/cli'
-            }
-        except Exception as e:
-            logging.error(f"Error executing command: {e}", exc_info=True)
-            return {
-                'success': False,
-                'error': str(e)
-            }
+        graph = params.get('graph')
 
-    def do_OPTIONS(self):
-        """Handle OPTIONS requests for CORS preflight."""
-        self._set_headers(204)
+        # Use datalog query instead of search for structured results
+        if not graph:
+            self._send_error_json('Missing required field: graph')
+            return
 
-    def do_GET(self):
-        """Handle GET requests."""
-        # Parse URL
-        parsed = urllib.parse.urlparse(self.path)
-        path = parsed.path
-        params = urllib.parse.parse_qs(parsed.query)
+        if params.get('raw') == 'true':
+            self._send_raw_query(_search_datalog(query), graph)
+            return
 
-        logging.info(f"GET {path} - {params}")
+        response = self._graph_pages(graph)
+        pages = response.get('data')
+        if not response.get('success') or not isinstance(pages, list):
+            self._send_json(response)
+            return
 
-        # Route handlers
-        if path == '/health':
-            self._send_json({'status': 'healthy', 'message': 'Logseq HTTP Server is running'})
+        # Same match as SEARCH_DATALOG: lowercase term in the (lowercase)
+        # name, or the term as typed in the title
+        query_lower = query.lower()
+        matches = [
+            page for page in pages
+            if query_lower in (page.get('block/name') or '')
+            or query in (page.get('block/title') or '')
+        ]
+
+        self._send_json({
+            'success': True,
+            'stdout': edn_dumps(matches),
+            'stderr': response.get('stderr', ''),
+            'returncode': response.get('returncode', 0),
+            'data': matches
+        })
+
+    # POST route handlers, called with the decoded JSON body
+
+    def _handle_query(self, data):
+        graph = data.get('graph')
+        query = data.get('query')
+
+        if not graph:
+            self._send_error_json('Missing required field: graph')
+            return
+        if not query:
+            self._send_error_json('Missing required field: query')
+            return
 
-        elif path == '/version':
-            self._send_json({'version': VERSION})
+        if data.get('raw') is True:
+            self._send_raw_query(query, graph)
+            return
 
-        elif path == '/list':
-            response = self._execute_logseq_command('list')
-            self._send_json(response)
+        # CLI v4.0 format: logseq query "datalog" -g graph-name
+        future = BATCH_QUEUE.submit(graph, query)
+        self._send_json(self._wait_for_batch(future))
 
-        elif path == '/show':
-            graph = params.get('graph', [None])[0]
-            if not graph:
-                self._send_error_json('Missing required parameter: graph')
-                return
+    def _get_api_token(self, data):
+        """
+        Get API token from request body, server config, or environment.
 
-            response = self._execute_logseq_command('show', [graph])
-            self._send_json(response)
+        Sends a 401 response and returns None if no token is available.
+        """
+        api_token = data.get('token') or LOGSEQ_API_TOKEN
+        if not api_token:
+            self._send_error_json(
+                'Missing API token. Set LOGSEQ_API_SERVER_TOKEN environment variable, '
+                'use --api-token flag, or include "token" in request body. '
+                'Token can be found in Logseq Settings > Features > HTTP APIs Server.',
+                401
+            )
+        return api_token
 
-        elif path == '/search':
-            query = params.get('q', [None])[0]
-            if not query:
-                self._send_error_json('Missing required parameter: q')
-                return
+    def _handle_append_to_journal(self, data):
+        # Append text to today's journal using Logseq's native HTTP API
+        # This works regardless of what page is currently open
+        content = data.get('content')
 
-            graph = params.get('graph', [None])[0]
+        if not content:
+            self._send_error_json('Missing required field: content')
+            return
 
-            # Use datalog query instead of search for structured results
-            # DB graphs use :block/title for content, not :block/content
-            # Build datalog query: find blocks where title contains search term
-            if not graph:
-                self._send_error_json('Missing required field: graph')
-                return
+        api_token = self._get_api_token(data)
+        if not api_token:
+            return
 
-            # Escape double quotes in query for safe inclusion in datalog
-            escaped_query_lower = query.replace('"', '\\"').lower()
-            escaped_query_orig = query.replace('"', '\\"')
+        response = self._append_to_journal(content, api_token)
+        if response.get('success'):
+            _invalidate_caches()
+            self._send_json({'success': True, 'message': 'Content appended to journal successfully'})
+        else:
+            self._send_error_json(response.get('error', 'Failed to append content'), 500)
 
-            # Datalog query to search for PAGES (not blocks) by page name OR title
-            # Search both name (lowercase) and title (mixed case) for better coverage
-            # This provides case-insensitive search by matching either field
-            # Returns page info: uuid, name, title, journal-day
-            datalog_query = f'[:find (pull ?p [:db/id :block/uuid :block/name :block/title :block/journal-day]) :where [?p :block/name ?name] [?p :block/title ?title] (or [(clojure.string/includes? ?name "{escaped_query_lower}")] [(clojure.string/includes? ?title "{escaped_query_orig}")])]'
+    def _handle_append(self, data):
+        # Append text to the current page in Logseq
+        # Requires Logseq desktop app to be running with HTTP API Server enabled
+        content = data.get('content')
 
-            # CLI v4.0 format: logseq query "datalog" -g graph-name
-            response = self._execute_logseq_command('query', [datalog_query, '-g', graph])
-            self._send_json(response)
+        if not content:
+            self._send_error_json('Missing required field: content')
+            return
 
+        api_token = self._get_api_token(data)
+        if not api_token:
+            return
+
+        response = self._execute_append_command(content, api_token)
+        if response.get('success'):
+            _invalidate_caches()
+            self._send_json({'success': True, 'message': 'Content appended successfully'})
         else:
+            self._send_error_json(response.get('error', 'Failed to append content'), 500)
+
+    # Route tables: path -> handler, looked up once per request
+    GET_ROUTES = {
+        '/health': _handle_health,
+        '/version': _handle_version,
+        '/list': _handle_list,
+        '/show': _handle_show,
+        '/search': _handle_search,
+    }
+
+    POST_ROUTES = {
+        '/query': _handle_query,
+        '/append-to-journal': _handle_append_to_journal,
+        '/append': _handle_append,
+    }
+
+    def _dispatch(self, handler, arg):
+        """Run a route handler, rejecting the request if the CLI is saturated."""
+        try:
+            handler(self, arg)
+        except ServerOverloadedError as e:
+            request_log.error(f"Rejecting request: {e}")
+            self._send_error_json('overloaded', 503)
+
+    def do_GET(self):
+        """Handle GET requests."""
+        # Fast path for plain health checks on connections being kept open
+        # (the canned response promises keep-alive)
+        if self.path == '/health' and not self.close_connection:
+            self.wfile.write(_HEALTH_RESPONSE)
+            self.log_request(200, len(_HEALTH_BODY))
+            return
+
+        # Parse URL
+        parsed = urllib.parse.urlparse(self.path)
+        path = parsed.path
+        # Every endpoint takes single-valued parameters; with repeats the
+        # last value wins
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+
+        log = health_log if path == '/health' else request_log
+        log.info("GET %s - %s", path, params)
+
+        handler = self.GET_ROUTES.get(path)
+        if handler is None:
             self._send_error_json(f'Unknown endpoint: {path}', 404)
+            return
+        self._dispatch(handler, params)
 
     def do_POST(self):
         """Handle POST requests."""
         parsed = urllib.parse.urlparse(self.path)
         path = parsed.path
 
-        logging.info(f"POST {path}")
+        request_log.info("POST %s", path)
 
-        # Read request body
+        # Read request body. It must be consumed in full for the connection
+        # to be reused; chunked bodies aren't supported, so don't try.
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            self.close_connection = True
+            self._send_error_json('Chunked request bodies are not supported', 411)
+            return
         content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length).decode('utf-8')
+        body = self.rfile.read(content_length)
 
         try:
-            data = json.loads(body) if body else {}
-        except json.JSONDecodeError:
+            data = _json_loads(body) if body else {}
+        except ValueError:
             self._send_error_json('Invalid JSON in request body')
             return
 
-        # Route handlers
-        if path == '/query':
-            graph = data.get('graph')
-            query = data.get('query')
-
-            if not graph:
-                self._send_error_json('Missing required field: graph')
-                return
-            if not query:
-                self._send_error_json('Missing required field: query')
-                return
-
-            # CLI v4.0 format: logseq query "datalog" -g graph-name
-            response = self._execute_logseq_command('query', [query, '-g', graph])
-            self._send_json(response)
-
-        elif path == '/append-to-journal':
-            # Append text to today's journal using Logseq's native HTTP API
-            # This works regardless of what page is currently open
-            content = data.get('content')
-
-            if not content:
-                self._send_error_json('Missing required field: content')
-                return
-
-            # Get API token from request body, server config, or environment
-            api_token = data.get('token') or LOGSEQ_API_TOKEN
-            if not api_token:
-                self._send_error_json(
-                    'Missing API token. Set LOGSEQ_API_SERVER_TOKEN environment variable, '
-                    'use --api-token flag, or include "token" in request body. '
-                    'Token can be found in Logseq Settings > Features > HTTP APIs Server.',
-                    401
-                )
-                return
-
-            response = self._append_to_journal(content, api_token)
-            if response.get('success'):
-                self._send_json({'success': True, 'message': 'Content appended to journal successfully'})
-            else:
-                self._send_error_json(response.get('error', 'Failed to append content'), 500)
-
-        elif path == '/append':
-            # Append text to the current page in Logseq
-            # Requires Logseq desktop app to be running with HTTP API Server enabled
-            content = data.get('content')
-
-            if not content:
-                self._send_error_json('Missing required field: content')
-                return
-
-            # Get API token from request body, server config, or environment
-            api_token = data.get('token') or LOGSEQ_API_TOKEN
-            if not api_token:
-                self._send_error_json(
-                    'Missing API token. Set LOGSEQ_API_SERVER_TOKEN environment variable, '
-                    'use --api-token flag, or include "token" in request body. '
-                    'Token can be found in Logseq Settings > Features > HTTP APIs Server.',
-                    401
-                )
-                return
-
-            response = self._execute_append_command(content, api_token)
-            if response.get('success'):
-                self._send_json({'success': True, 'message': 'Content appended successfully'})
-            else:
-                self._send_error_json(response.get('error', 'Failed to append content'), 500)
-
-        else:
+        handler = self.POST_ROUTES.get(path)
+        if handler is None:
             self._send_error_json(f'Unknown endpoint: {path}', 404)
+            return
+        self._dispatch(handler, data)
 
     def log_message(self, format, *args):
         """Override to use our logger instead of stderr."""
-        logging.info(format % args)
+        # self.path isn't set yet when the request line itself is rejected
+        log = health_log if getattr(self, 'path', None) == '/health' else request_log
+        log.info(format, *args)
 
 
 def main():
     """Start the HTTP server."""
-    global LOGSEQ_API_TOKEN
+    global LOGSEQ_API_TOKEN, DEBUG
 
     parser = argparse.ArgumentParser(description='Logseq CLI HTTP Server')
     parser.add_argument('--port', type=int, default=DEFAULT_PORT,
@@ -482,8 +1459,8 @@ def main():
         LOGSEQ_API_TOKEN = args.api_token
 
     # Display debug warning if enabled
+    DEBUG = args.debug
     if args.debug:
-        import time
         print("\n" + "="*60)
         print("⚠️  WARNING: DEBUG MODE ENABLED")
         print("="*60)
@@ -504,23 +1481,34 @@ def main():
         # Give user time to see warning
         time.sleep(3)
 
-    # Set up logging with privacy filter
+    # Set up logging with privacy filter. Request threads only filter and
+    # enqueue records; formatting and the file/console writes happen on the
+    # QueueListener's thread, so disk I/O never blocks a request.
     privacy_filter = PrivacyFilter(debug_mode=args.debug)
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
     file_handler = logging.FileHandler(LOG_FILE)
-    file_handler.addFilter(privacy_filter)
+    file_handler.setFormatter(formatter)
 
     console_handler = logging.StreamHandler()
-    console_handler.addFilter(privacy_filter)
+    console_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LocalQueueHandler(log_queue)
+    queue_handler.addFilter(privacy_filter)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(queue_handler)
+
+    log_listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    log_listener.start()
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[file_handler, console_handler]
-    )
+    # CLI processes inherit this rather than getting a cwd per call
+    os.chdir(SAFE_CWD)
 
     server_address = (args.host, args.port)
-    httpd = http.server.HTTPServer(server_address, LogseqHTTPHandler)
+    httpd = http.server.ThreadingHTTPServer(server_address, LogseqHTTPHandler)
 
     print(f"{'='*60}")
     print(f"Logseq HTTP Server v{VERSION}")
@@ -543,16 +1531,19 @@ def main():
     print(f"{'='*60}\n")
 
     if args.debug:
-        logging.info(f"Server v{VERSION} started on {args.host}:{args.port} (DEBUG MODE)")
+        system_log.info(f"Server v{VERSION} started on {args.host}:{args.port} (DEBUG MODE)")
     else:
-        logging.info(f"Server v{VERSION} started on {args.host}:{args.port} (Privacy Mode)")
+        system_log.info(f"Server v{VERSION} started on {args.host}:{args.port} (Privacy Mode)")
 
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\n\nShutting down server...")
-        logging.info("Server stopped by user")
+        system_log.info("Server stopped by user")
         httpd.shutdown()
+    finally:
+        # Flush records still waiting in the queue
+        log_listener.stop()
 
 
 if __name__ == '__main__':
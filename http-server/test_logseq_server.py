@@ -0,0 +1,259 @@
+"""
+Checks for logseq_server that run without Logseq or the logseq CLI.
+
+Usage:
+    python3 -m unittest test_logseq_server
+"""
+
+import concurrent.futures
+import logging
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import logseq_server
+
+
+# logseq.DB.datascriptQuery result for PAGE_LIST_DATALOG: one 1-tuple per page,
+# keys without their namespace and camelCased (normalize-keyword-for-json)
+API_PAGE_ROWS = [
+    [{'id': 1, 'uuid': '6650b0c2-0000-4000-8000-000000000001', 'name': 'api design',
+      'title': 'API Design'}],
+    [{'id': 2, 'uuid': '6650b0c2-0000-4000-8000-000000000002', 'name': 'oct 14th, 2026',
+      'title': 'Oct 14th, 2026', 'journalDay': 20261014}],
+]
+
+CLI_PAGES = [
+    {'db/id': 1, 'block/uuid': '6650b0c2-0000-4000-8000-000000000001', 'block/name': 'api design',
+     'block/title': 'API Design'},
+    {'db/id': 2, 'block/uuid': '6650b0c2-0000-4000-8000-000000000002', 'block/name': 'oct 14th, 2026',
+     'block/title': 'Oct 14th, 2026', 'block/journal-day': 20261014},
+]
+
+
+def fake_api(rows):
+    """Return a LogseqClient.call replacement serving rows for 'notes'."""
+    def call(method, args, api_token):
+        if method == 'logseq.App.getCurrentGraph':
+            return {'name': 'notes', 'url': 'logseq_db_notes'}
+        if method == 'logseq.DB.datascriptQuery':
+            return rows
+        raise AssertionError(f'unexpected API method {method}')
+    return call
+
+
+# `logseq query` output (pull with a ref, a set, tagged literals, escapes)
+# and what `jet --to json` made of it
+CLI_QUERY_OUTPUT = r"""
+[{:db/id 12,
+  :block/uuid #uuid "6650b0c2-0000-4000-8000-00000000000c",
+  :block/title "Say \"hi\"\tto \u00e9t\u00e9 \\ done",
+  :block/tags #{:logseq.class/Task :user.class/Project-abc},
+  :block/page {:db/id 3},
+  :block/created-at 1728864000000,
+  :block/order "a0",
+  :logseq.property/status :logseq.property/status.doing,
+  :logseq.property/deadline #inst "2026-10-14T00:00:00.000-00:00",
+  :block/collapsed? false
+  #_#_:block/hidden true
+  :block/marker nil}
+ {:db/id 13, :block/chars [\a \newline A \,], :block/ratio -1.5e3, :block/big 42N}]
+"""
+JET_QUERY_JSON = [
+    {'db/id': 12,
+     'block/uuid': '6650b0c2-0000-4000-8000-00000000000c',
+     'block/title': 'Say "hi"\tto été \\ done',
+     'block/tags': ['logseq.class/Task', 'user.class/Project-abc'],
+     'block/page': {'db/id': 3},
+     'block/created-at': 1728864000000,
+     'block/order': 'a0',
+     'logseq.property/status': 'logseq.property/status.doing',
+     'logseq.property/deadline': '2026-10-14T00:00:00.000-00:00',
+     'block/collapsed?': False,
+     'block/marker': None},
+    {'db/id': 13, 'block/chars': ['a', '\n', 'A', ','], 'block/ratio': -1500.0, 'block/big': 42},
+]
+
+
+class EDNTest(unittest.TestCase):
+
+    def test_cli_query_output_converts_like_jet(self):
+        self.assertEqual(logseq_server.edn_loads(CLI_QUERY_OUTPUT), JET_QUERY_JSON)
+
+    def test_lists_comments_and_empty_collections(self):
+        self.assertEqual(
+            logseq_server.edn_loads('(; results\n [1 "a"] [] {} #{})'),
+            [[1, 'a'], [], {}, []]
+        )
+
+    def test_invalid_input_raises(self):
+        for text in ['', '[{:db/id 1', '{:block/title "unterminated}', '"\\u00e"', '"\\q"',
+                     '{:a}', '[1 2))', ']', '#uuid', '[1] 2', '\\']:
+            with self.subTest(text=text):
+                with self.assertRaises(logseq_server.EDNDecodeError):
+                    logseq_server.edn_loads(text)
+
+
+    def test_namespaced_map_keys_are_qualified(self):
+        self.assertEqual(
+            logseq_server.edn_loads('[#:block{:name "x", :db/id 3, :_/plain 1, "s" 2}]'),
+            [{'block/name': 'x', 'db/id': 3, 'plain': 1, 's': 2}]
+        )
+
+    def test_auto_resolved_namespaced_map_is_rejected(self):
+        with self.assertRaises(logseq_server.EDNDecodeError):
+            logseq_server.edn_loads('#::{:name "x"}')
+
+
+class PrivacyFilterTest(unittest.TestCase):
+
+    def passes(self, adapter, level=logging.INFO, debug_mode=False):
+        """Whether PrivacyFilter lets a record logged through adapter through."""
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        handler.addFilter(logseq_server.PrivacyFilter(debug_mode=debug_mode))
+        logger = adapter.logger if isinstance(adapter, logging.LoggerAdapter) else adapter
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.DEBUG)
+        with mock.patch.object(logger, 'propagate', False):
+            adapter.log(level, 'message')
+        return bool(records)
+
+    def test_privacy_mode_drops_request_info(self):
+        self.assertFalse(self.passes(logseq_server.request_log))
+
+    def test_privacy_mode_keeps_health_system_and_errors(self):
+        self.assertTrue(self.passes(logseq_server.health_log))
+        self.assertTrue(self.passes(logseq_server.system_log))
+        self.assertTrue(self.passes(logseq_server.request_log, logging.ERROR))
+
+    def test_uncategorized_records_are_blocked(self):
+        self.assertFalse(self.passes(logging.getLogger('test_logseq_server.other')))
+
+    def test_debug_mode_logs_everything(self):
+        self.assertTrue(self.passes(logseq_server.request_log, debug_mode=True))
+        self.assertTrue(self.passes(logging.getLogger('test_logseq_server.other'), debug_mode=True))
+
+
+class QueryViaAPITest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(logseq_server, 'LOGSEQ_API_TOKEN', 'token')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def query(self, query, rows):
+        with mock.patch.object(logseq_server.LOGSEQ_CLIENT, 'call', side_effect=fake_api(rows)):
+            return logseq_server._query_via_api(query, 'notes')
+
+    def test_pull_keys_match_cli(self):
+        response = self.query(logseq_server.PAGE_LIST_DATALOG, API_PAGE_ROWS)
+        self.assertTrue(response['success'])
+        self.assertEqual(response['data'], CLI_PAGES)
+        self.assertEqual(logseq_server.edn_loads(response['stdout']), CLI_PAGES)
+
+    def test_unmapped_shapes_fall_back_to_cli(self):
+        self.assertIsNone(self.query('[:find ?name :where [?p :block/name ?name]]', [['a']]))
+        self.assertIsNone(self.query('[:find (pull ?p [*]) :where [?p :block/name]]', API_PAGE_ROWS))
+        self.assertIsNone(self.query(logseq_server.PAGE_LIST_DATALOG, [[{'id': 1, 'page': {'id': 2}}]]))
+        self.assertIsNone(self.query(logseq_server.PAGE_LIST_DATALOG, [[{'id': 1, 'name': ['x']}]]))
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        logseq_server.PAGE_CACHE.clear()
+        self.addCleanup(logseq_server.PAGE_CACHE.clear)
+
+    def search(self, term, pages, full=False):
+        """Run /search against a page list, returning the matches (or the whole response)."""
+        future = concurrent.futures.Future()
+        future.set_result({'success': True, 'stdout': '', 'stderr': '', 'returncode': 0, 'data': pages})
+        handler = logseq_server.LogseqHTTPHandler.__new__(logseq_server.LogseqHTTPHandler)
+        handler._send_json = mock.Mock()
+        with mock.patch.object(logseq_server.BATCH_QUEUE, 'submit', return_value=future):
+            handler._handle_search({'q': term, 'graph': 'notes'})
+        response = handler._send_json.call_args.args[0]
+        return response if full else response['data']
+
+    def test_matches_name_or_title(self):
+        self.assertEqual(self.search('Api', CLI_PAGES), CLI_PAGES[:1])
+        self.assertEqual(self.search('Oct', CLI_PAGES), CLI_PAGES[1:])
+
+    def test_stdout_carries_the_matches_as_edn(self):
+        handler_response = self.search('Api', CLI_PAGES, full=True)
+        self.assertEqual(logseq_server.edn_loads(handler_response['stdout']), CLI_PAGES[:1])
+
+    def test_api_shaped_pages_are_normalized(self):
+        api_pages = [row[0] for row in API_PAGE_ROWS]
+        self.assertEqual(self.search('api', api_pages), CLI_PAGES[:1])
+
+
+class RawQueryTest(unittest.TestCase):
+
+    def test_cli_errors_are_sent_as_json(self):
+        handler = logseq_server.LogseqHTTPHandler.__new__(logseq_server.LogseqHTTPHandler)
+        handler._send_json = mock.Mock()
+        with tempfile.NamedTemporaryFile() as not_executable, \
+                mock.patch.object(logseq_server, 'LOGSEQ_BIN', not_executable.name), \
+                self.assertLogs('logseq_server', 'ERROR'):
+            handler._send_raw_query('[:find ?p]', 'notes')
+        self.assertFalse(handler._send_json.call_args.args[0]['success'])
+
+
+class BatchQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        # Run calls only when the test says so
+        self.batch_queue = logseq_server.BatchQueue()
+        self.batch_queue._executor = mock.Mock()
+
+    def run_call(self):
+        """Run the Logseq call the last new submission queued."""
+        fn, *args = self.batch_queue._executor.submit.call_args.args
+        fn(*args)
+
+    def test_identical_queries_share_a_call_while_in_flight(self):
+        first = self.batch_queue.submit('notes', '[:find ?p]')
+        second = self.batch_queue.submit('notes', '[:find ?p]')
+        other = self.batch_queue.submit('other', '[:find ?p]')
+        self.assertEqual(self.batch_queue._executor.submit.call_count, 2)
+
+        response = {'success': False, 'error': 'x'}
+        with mock.patch.object(logseq_server, '_execute_logseq_command', return_value=response) as execute:
+            fn, *args = self.batch_queue._executor.submit.call_args_list[0].args
+            fn(*args)
+        execute.assert_called_once()
+        self.assertIs(first.result(0), response)
+        self.assertIs(second.result(0), response)
+        self.assertFalse(other.done())
+
+        # The call is over, so the next one starts a new call
+        self.batch_queue.submit('notes', '[:find ?p]')
+        self.assertEqual(self.batch_queue._executor.submit.call_count, 3)
+
+    def test_cancelled_callers_do_not_run_the_cli(self):
+        self.batch_queue.submit('notes', '[:find ?p]').cancel()
+        with mock.patch.object(logseq_server, '_execute_logseq_command') as execute:
+            self.run_call()
+        execute.assert_not_called()
+        self.assertEqual(self.batch_queue._in_flight, {})
+
+    def test_slot_wait_counts_from_submission(self):
+        future = self.batch_queue.submit('notes', '[:find ?p]')
+        with mock.patch.object(logseq_server, '_CLI_SEMAPHORE') as semaphore, \
+                mock.patch.object(logseq_server.subprocess, 'run') as run, \
+                mock.patch.object(logseq_server.time, 'monotonic',
+                                  return_value=time.monotonic() + logseq_server.CLI_SLOT_TIMEOUT):
+            semaphore.acquire.return_value = False
+            self.run_call()
+        self.assertEqual(semaphore.acquire.call_args.kwargs['timeout'], 0)
+        self.assertRaises(logseq_server.ServerOverloadedError, future.result, 0)
+        run.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()